@@ -1,42 +1,246 @@
 import spacy
 import os
+import sys
+import re
+import functools
+import threading
 import requests
+import orjson
 import dateparser
+from cachetools import TTLCache
+from concurrent.futures import Future
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Load the spaCy model
+# OpenWeatherMap settings, resolved once per process
+_API_KEY = os.getenv("OPENWEATHERMAP_API_KEY")
+_API_KEY_ERROR = "Error: OPENWEATHERMAP_API_KEY not found. Please set it in your .env file."
+_WEATHER_URL = "http://api.openweathermap.org/data/2.5/weather"
+_FORECAST_URL = "http://api.openweathermap.org/data/2.5/forecast"
+_BASE_PARAMS = {"appid": _API_KEY, "units": "imperial"}
+if not _API_KEY:
+    print(_API_KEY_ERROR)
+
+# Load the spaCy model. Only NER and the dependency parse (for noun_chunks) are
+# used; the tagger and attribute_ruler stay on because noun_chunks needs POS tags.
+# Excluded components are never deserialised, so they cost neither load time nor memory.
+SPACY_EXCLUDED = ["lemmatizer"]
+
+
+def load_nlp(model="en_core_web_sm"):
+    """
+    Loads the spaCy pipeline, downloading the model on first use.
+    """
+    try:
+        return spacy.load(model, exclude=SPACY_EXCLUDED)
+    except OSError:
+        print(f"Downloading spaCy model '{model}'...")
+        from spacy.cli import download
+        download(model)
+        return spacy.load(model, exclude=SPACY_EXCLUDED)
+
+
+nlp = load_nlp()
+
+# Batch size for nlp.pipe when several questions are processed together
+SPACY_BATCH_SIZE = 32
 try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    print("Downloading spaCy model 'en_core_web_sm'...")
-    from spacy.cli import download
-    download("en_core_web_sm")
-    nlp = spacy.load("en_core_web_sm")
+    SPACY_BATCH_SIZE = int(os.getenv("WEATHER_SPACY_BATCH_SIZE", SPACY_BATCH_SIZE))
+except ValueError:
+    print(f"Warning: WEATHER_SPACY_BATCH_SIZE must be an integer. Using {SPACY_BATCH_SIZE}.")
 
 
-def get_weather(location, intent, date):
+@functools.lru_cache(maxsize=256)
+def parse_question(question):
     """
-    Fetches current weather data from the OpenWeatherMap API.
+    Runs the spaCy pipeline on a question, caching the Doc for repeated phrasings.
     """
-    api_key = os.getenv("OPENWEATHERMAP_API_KEY")
-    if not api_key:
-        return "Error: OPENWEATHERMAP_API_KEY not found. Please set it in your .env file."
+    return nlp(question)
 
-    base_url = "http://api.openweathermap.org/data/2.5/weather"
-    params = {
-        "q": location,
-        "appid": api_key,
-        "units": "imperial"
-    }
+
+def warm_up_nlp():
+    """
+    Runs the spaCy pipeline once in the background so the first question doesn't pay the cold-start cost.
+    """
+    threading.Thread(target=lambda: nlp("warmup"), daemon=True).start()
+
+# Shared HTTP session so repeat questions reuse the keep-alive connection to OpenWeatherMap
+_SESSION = requests.Session()
+_SESSION.headers['Connection'] = 'keep-alive'
+_ADAPTER = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+
+# Parsed API payloads, keyed on (endpoint, location), so repeat questions within five
+# minutes skip the HTTP round-trip. _IN_FLIGHT holds a Future per key while it's being fetched.
+_RESPONSE_CACHE = TTLCache(maxsize=128, ttl=300)
+_IN_FLIGHT = {}
+_CACHE_LOCK = threading.Lock()
+
+# Fast-path patterns for templated questions like "what's the temperature in London tomorrow?".
+# The location must be one or more capitalised words followed by closing punctuation, the end,
+# or a date word. A "." mid-sentence is an abbreviation ("St. Louis"), so it doesn't end the location.
+# Capitalised date words ("Monday", "Tomorrow") are never part of the location.
+_LOCATION_WORD = r'(?!(?i:today|tonight|tomorrow|yesterday|(?:mon|tues|wednes|thurs|fri|satur|sun)day)\b)[A-Z][A-Za-z]*'
+LOCATION_RE = re.compile(
+    rf'\b(?i:in|for|at)\s+({_LOCATION_WORD}(?:\s+{_LOCATION_WORD})*)([?.!]\s*$|$|\s+(?i:on|tomorrow|today|tonight|this|next)\b)')
+# Every "in/for/at <Capitalised>" phrase; more than one ("in London in Celsius") is ambiguous
+LOCATION_CANDIDATE_RE = re.compile(r'\b(?i:in|for|at)\s+[A-Z]')
+INTENT_RE = re.compile(r'\b(weather|temperature|humidity|wind|forecast)\b', re.I)
+# Anything that looks like a date phrase. Deliberately broad: a hit that isn't in the
+# keyword tables below sends the question to spaCy rather than being dropped.
+DATE_RE = re.compile(
+    r'\b(?:(?:next|this|last)\s+)?(?:today|tonight|tomorrow|yesterday|week(?:end)?|month|year|morning|afternoon|evening'
+    r'|(?:mon|tues|wednes|thurs|fri|satur|sun)day|jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec|\d+)\w*', re.I)
+
+# Day offsets for the date phrases that show up in most questions, resolved without dateparser
+_FAST_DATES = {"today": 0, "tonight": 0, "now": 0, "tomorrow": 1, "yesterday": -1, "next week": 7}
+_WEEKDAYS = {day: i for i, day in enumerate(
+    ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"])}
+
+# Explicit formats tried with strptime before handing a phrase to dateparser
+_DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y", "%m/%d", "%B %d", "%b %d", "%d %B", "%d %b"]
+
+
+def is_fast_date(date_entity):
+    """
+    Returns True if resolve_date can handle the phrase without dateparser.
+    """
+    key = date_entity.lower().strip()
+    return key in _FAST_DATES or key in _WEEKDAYS
+
+
+def match_location(question):
+    """
+    Returns the regex location candidate, or None if there isn't exactly one
+    unambiguous "in/for/at <Place>" phrase or a date phrase overlaps it.
+    """
+    if len(LOCATION_CANDIDATE_RE.findall(question)) > 1:
+        return None
+    location_match = LOCATION_RE.search(question)
+    if not location_match:
+        return None
+
+    location_start, location_end = location_match.span(1)
+    # A date phrase inside the location means the slots overlap; let spaCy separate them
+    if any(m.start() < location_end and m.end() > location_start for m in DATE_RE.finditer(question)):
+        return None
+    return location_match.group(1).strip()
+
+
+def match_question(question):
+    """
+    Tries to fill every slot with regexes alone. Returns (location, date_entity) when the
+    question names a location and an intent and its date phrase, if any, is one
+    resolve_date handles without dateparser. Otherwise returns None.
+
+    >>> match_question("What is the temperature in New York?")
+    ('New York', None)
+    >>> match_question("What's the humidity in St. Louis?") is None
+    True
+    >>> match_question("What is the temperature in Washington D.C.?") is None
+    True
+    >>> match_question("What's the temperature in London in Celsius?") is None
+    True
+    >>> match_question("What's the weather in Paris at Noon?") is None
+    True
+    >>> match_question("What's tomorrow's temperature in Paris?")
+    ('Paris', 'tomorrow')
+    >>> match_question("Tell me the forecast for New York on Friday")
+    ('New York', 'Friday')
+    >>> match_question("What's the temperature in London in Celsius tomorrow?") is None
+    True
+    >>> match_question("What's the humidity in St. Louis tomorrow?") is None
+    True
+    >>> match_question("What is the forecast for London Monday?") is None
+    True
+    """
+    location = match_location(question)
+    if not location or not INTENT_RE.search(question):
+        return None
+
+    date_entities = DATE_RE.findall(question)
+    if not date_entities:
+        return location, None
+    if len(date_entities) == 1 and is_fast_date(date_entities[0]):
+        return location, date_entities[0]
+    return None
+
+
+def fetch_data(base_url, params):
+    """
+    Fetches the JSON payload for a location, serving it from the TTL cache when possible.
+    Concurrent requests for the same endpoint and location share a single HTTP call.
+    """
+    key = (base_url, params["q"].lower())
+    with _CACHE_LOCK:
+        data = _RESPONSE_CACHE.get(key)
+        if data is not None:
+            return data
+        future = _IN_FLIGHT.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = _IN_FLIGHT[key] = Future()
+
+    if not is_owner:
+        return future.result()
 
     try:
-        response = requests.get(base_url, params=params, timeout=10) # 10-second timeout
+        response = _SESSION.get(base_url, params=params, timeout=10) # 10-second timeout
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
+    except Exception as e:
+        with _CACHE_LOCK:
+            del _IN_FLIGHT[key]
+        future.set_exception(e)
+        raise
+
+    with _CACHE_LOCK:
+        _RESPONSE_CACHE[key] = data
+        del _IN_FLIGHT[key]
+    future.set_result(data)
+    return data
+
+
+def prefetch_weather(question):
+    """
+    Starts fetching current weather for the regex location candidate in the background,
+    so the HTTP round-trip overlaps with the spaCy parse. The payload lands in the
+    response cache (or in-flight table) where get_weather picks it up.
+    """
+    # Same location checks as the fast path, so ambiguous candidates ("St", "Celsius") aren't fetched
+    location = match_location(question)
+    if not _API_KEY or not location:
+        return
+    # A date phrase or "forecast" means the answer will most likely come from the forecast endpoint
+    if DATE_RE.search(question) or "forecast" in question.lower():
+        return
+
+    params = {**_BASE_PARAMS, "q": location}
+
+    def fetch_quietly():
+        try:
+            fetch_data(_WEATHER_URL, params)
+        except Exception:
+            pass # Anyone waiting on this fetch gets the error through its in-flight Future
+
+    # Daemon thread, so a pending prefetch never holds up interpreter exit
+    threading.Thread(target=fetch_quietly, daemon=True).start()
+
+
+def get_weather(location, intent, date):
+    """
+    Fetches current weather data from the OpenWeatherMap API.
+    """
+    if not _API_KEY:
+        return _API_KEY_ERROR
+
+    try:
+        data = fetch_data(_WEATHER_URL, {**_BASE_PARAMS, "q": location})
 
         if intent == "temperature":
             temp = data['main']['temp']
@@ -52,7 +256,7 @@ def get_weather(location, intent, date):
             temp = data['main']['temp']
             return f"The current weather in {location} is {weather_desc} with a temperature of {temp}°F."
 
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         return f"Error fetching weather data: {e}"
     except KeyError:
         return f"Could not find weather data for {location}. Please check the location name."
@@ -61,88 +265,123 @@ def get_forecast(location, date):
     """
     Fetches 5-day weather forecast data from the OpenWeatherMap API.
     """
-    api_key = os.getenv("OPENWEATHERMAP_API_KEY")
-    if not api_key:
-        return "Error: OPENWEATHERMAP_API_KEY not found. Please set it in your .env file."
-
-    base_url = "http://api.openweathermap.org/data/2.5/forecast"
-    params = {
-        "q": location,
-        "appid": api_key,
-        "units": "imperial"
-    }
+    if not _API_KEY:
+        return _API_KEY_ERROR
 
     try:
-        response = requests.get(base_url, params=params, timeout=10) # 10-second timeout
-        response.raise_for_status()
-        data = response.json()
-
-        forecasts = data['list']
-        target_forecasts = []
-        for forecast in forecasts:
-            forecast_date = datetime.fromtimestamp(forecast['dt'])
-            if forecast_date.date() == date.date():
-                target_forecasts.append(forecast)
+        data = fetch_data(_FORECAST_URL, {**_BASE_PARAMS, "q": location})
+
+        # Compare raw epoch seconds against the local day's bounds rather than
+        # building a datetime for every entry.
+        midnight = date.replace(hour=0, minute=0, second=0, microsecond=0)
+        day_start = int(midnight.timestamp())
+        day_end = int((midnight + timedelta(days=1)).timestamp())
+        target_forecasts = [f for f in data['list'] if day_start <= f['dt'] < day_end]
         
         if not target_forecasts:
             return f"No forecast data available for {location} on {date.strftime('%Y-%m-%d')}."
 
-        summary = f"Forecast for {location} on {date.strftime('%A, %B %d')}:\n"
+        parts = [f"Forecast for {location} on {date.strftime('%A, %B %d')}:"]
         for forecast in target_forecasts:
             time = datetime.fromtimestamp(forecast['dt']).strftime('%I:%M %p')
             weather_desc = forecast['weather'][0]['description']
             temp = forecast['main']['temp']
-            summary += f"- {time}: {weather_desc.capitalize()}, {temp}°F\n"
-        
-        return summary
+            parts.append(f"- {time}: {weather_desc.capitalize()}, {temp}°F")
+
+        return "\n".join(parts)
 
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         return f"Error fetching forecast data: {e}"
     except KeyError:
         return f"Could not find forecast data for {location}. Please check the location name."
 
 
-def process_question(question):
+@functools.lru_cache(maxsize=256)
+def parse_date(date_entity, today_iso):
     """
-    Processes the user's question to extract location, intent, and date.
+    Parses a date phrase, trying a few fixed formats before falling back to dateparser.
+    today_iso is part of the cache key so relative phrases are re-resolved once the day changes.
     """
-    doc = nlp(question)
+    entity = date_entity.strip()
+    today = datetime.fromisoformat(today_iso)
+    for fmt in _DATE_FORMATS:
+        if "%Y" in fmt:
+            try:
+                return datetime.strptime(entity, fmt)
+            except ValueError:
+                continue
+        # Supply the year ourselves: strptime's 1900 default rejects Feb 29 and newer
+        # Pythons warn about it. Like dateparser's PREFER_DATES_FROM='future', roll
+        # year-less dates that have already passed forward a year.
+        for year in (today.year, today.year + 1):
+            try:
+                parsed = datetime.strptime(f"{entity} {year}", fmt + " %Y")
+            except ValueError:
+                continue
+            if parsed >= today:
+                return parsed
+    return dateparser.parse(date_entity, settings={'PREFER_DATES_FROM': 'future'})
+
 
+def resolve_date(date_entity, now):
+    """
+    Resolves a DATE entity relative to now, using keyword lookups for the common cases.
+    """
+    key = date_entity.lower().strip()
+    if key in _FAST_DATES:
+        return now + timedelta(days=_FAST_DATES[key])
+    if key in _WEEKDAYS:
+        return now + timedelta(days=(_WEEKDAYS[key] - now.weekday()) % 7)
+    return parse_date(date_entity, now.date().isoformat())
+
+
+def extract_entities(doc):
+    """
+    Pulls the location and the raw date phrase out of a parsed question.
+    """
     location = None
     for ent in doc.ents:
         if ent.label_ == "GPE":
             location = ent.text
             break
-    
+
     if not location:
         for chunk in doc.noun_chunks:
              if "in" in chunk.root.head.text or "for" in chunk.root.head.text:
                  location = chunk.text
                  break
 
-    if not location:
-        return "Could not determine the location from your question.", None, None
-
     date_entity = None
     for ent in doc.ents:
         if ent.label_ == "DATE":
             date_entity = ent.text
             break
-    
+
+    return location, date_entity
+
+
+def classify_question(question, location, date_entity):
+    """
+    Works out the intent and target date once the location and date phrase are known.
+    """
+    if not location:
+        return "Could not determine the location from your question.", None, None
+
     target_date = datetime.now()
     if date_entity:
-        parsed_date = dateparser.parse(date_entity, settings={'PREFER_DATES_FROM': 'future'})
+        parsed_date = resolve_date(date_entity, target_date)
         if parsed_date:
             target_date = parsed_date
 
+    q_lower = question.lower()
     intent = "current weather"
-    if "temperature" in question.lower():
+    if "temperature" in q_lower:
         intent = "temperature"
-    elif "humidity" in question.lower():
+    elif "humidity" in q_lower:
         intent = "humidity"
-    elif "wind" in question.lower():
+    elif "wind" in q_lower:
         intent = "wind speed"
-    elif "forecast" in question.lower() or (date_entity and target_date.date() > datetime.now().date()):
+    elif "forecast" in q_lower or (date_entity and target_date.date() > datetime.now().date()):
         intent = "forecast"
 
     now = datetime.now()
@@ -156,34 +395,91 @@ def process_question(question):
         return location, intent, now
 
 
+def process_question(question, lazy_nlp=True):
+    """
+    Processes the user's question to extract location, intent, and date.
+    With lazy_nlp, the spaCy pipeline only runs when the regex fast path misses.
+    """
+    match = match_question(question) if lazy_nlp else None
+    if match:
+        return classify_question(question, *match)
+
+    if lazy_nlp:
+        prefetch_weather(question)
+    return classify_question(question, *extract_entities(parse_question(question)))
+
+
+def process_questions(questions, lazy_nlp=True):
+    """
+    Processes a batch of questions, running the ones the regex fast path can't
+    handle through nlp.pipe together. Results are returned in input order.
+    """
+    results = [None] * len(questions)
+    pending = []
+    for i, question in enumerate(questions):
+        match = match_question(question) if lazy_nlp else None
+        if match:
+            results[i] = classify_question(question, *match)
+        else:
+            pending.append(i)
+
+    docs = nlp.pipe((questions[i] for i in pending), batch_size=SPACY_BATCH_SIZE)
+    for i, doc in zip(pending, docs):
+        results[i] = classify_question(questions[i], *extract_entities(doc))
+    return results
+
+
+def build_response(location, intent, date):
+    """
+    Turns the output of process_question into the bot's reply.
+    """
+    if intent == "past_weather":
+        return "I'm sorry, but I cannot retrieve historical weather data with the current plan."
+    elif intent == "future_weather_limit":
+        return f"I can only provide a 5-day forecast. {date.strftime('%Y-%m-%d')} is too far in the future."
+    elif location and intent:
+        if intent == 'forecast':
+            return get_forecast(location, date)
+        else:
+            return get_weather(location, intent, date)
+    else:
+        return location # Contains the error message from process_question
+
+
+def get_weather_response(question):
+    """
+    Answers a weather question end to end, returning the response text.
+    """
+    return build_response(*process_question(question))
+
+
 def main():
     """
     Main function to run the weather AI bot in the console.
     """
+    warm_up_nlp()
     print("Hello! I am a weather bot. Ask me a question about the weather.")
     print("For example: 'What is the temperature in London?' or 'Tell me the forecast for New York.'")
-    
+
+    # Piped input arrives all at once, so parse it as a single batch
+    if not sys.stdin.isatty():
+        questions = []
+        for line in sys.stdin:
+            question = line.strip()
+            if question.lower() in ["exit", "quit"]:
+                break
+            if question:
+                questions.append(question)
+        for result in process_questions(questions):
+            print(build_response(*result))
+        return
+
     while True:
         question = input("> ")
         if question.lower() in ["exit", "quit"]:
             break
 
-        location, intent, date = process_question(question)
-
-        response = ""
-        if intent == "past_weather":
-            response = "I'm sorry, but I cannot retrieve historical weather data with the current plan."
-        elif intent == "future_weather_limit":
-            response = f"I can only provide a 5-day forecast. {date.strftime('%Y-%m-%d')} is too far in the future."
-        elif location and intent:
-            if intent == 'forecast':
-                response = get_forecast(location, date)
-            else:
-                response = get_weather(location, intent, date)
-        else:
-            response = location # Contains the error message from process_question
-
-        print(response)
+        print(get_weather_response(question))
 
 if __name__ == "__main__":
     main()